@@ -13,11 +13,47 @@ from typing import Any, Mapping, MutableMapping
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:  # libyaml bindings unavailable; fall back to the pure-Python loader
+    from yaml import SafeLoader as _Loader
+
 
 class ConfigError(ValueError):
     """Raised when the YAML configuration is missing required attributes."""
 
 
+# Top-level sections read by MCPConfig.from_file; anything else in the file is ignored.
+CONFIG_SECTIONS = frozenset({"paths", "processing", "identity", "logging", "limits"})
+
+
+def _load_sections(raw_data: str) -> Any:
+    """
+    Parse only the known top-level sections of the YAML document.
+
+    The document is composed into a node graph, but Python objects are only
+    constructed for CONFIG_SECTIONS, so large unrelated sections cost no more
+    than tokenizing them.
+    """
+    loader = _Loader(raw_data)
+    try:
+        node = loader.get_single_node()
+        if node is None:
+            return {}
+        if not isinstance(node, yaml.MappingNode):
+            return loader.construct_document(node)
+
+        loader.flatten_mapping(node)  # resolve top-level "<<" merge keys
+        payload: dict[str, Any] = {}
+        for key_node, value_node in node.value:
+            if not isinstance(key_node, yaml.ScalarNode) or key_node.value not in CONFIG_SECTIONS:
+                continue
+            payload[key_node.value] = loader.construct_object(value_node, deep=True)
+        return payload
+    finally:
+        loader.dispose()
+
+
 def _expand_path(value: str | Path, base_dir: Path) -> Path:
     path = Path(value)
     if not path.is_absolute():
@@ -137,19 +173,20 @@ class MCPConfig:
     logging: LoggingSettings
     limits: LimitSettings
     state_filename: str = field(default=".anonymizer_mcp_state.json")
+    state_file: Path = field(init=False)
 
-    @property
-    def state_file(self) -> Path:
-        return self.paths.temp_dir / self.state_filename
+    def __post_init__(self) -> None:
+        # Resolved once; paths are not expected to change after loading.
+        self.state_file = self.paths.temp_dir / self.state_filename
 
     @classmethod
     def from_file(cls, yaml_path: str | Path) -> "MCPConfig":
         path = Path(yaml_path).expanduser()
-        if not path.exists():
-            raise ConfigError(f"Configuration file not found: {path}")
-
-        raw_data = path.read_text(encoding="utf-8")
-        payload = yaml.safe_load(raw_data) or {}
+        try:
+            raw_data = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            raise ConfigError(f"Configuration file not found: {path}") from None
+        payload = _load_sections(raw_data) or {}
         if not isinstance(payload, MutableMapping):
             raise ConfigError("Configuration file must contain a mapping at the top level.")
 
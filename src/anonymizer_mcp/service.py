@@ -5,9 +5,13 @@ Core orchestration layer for the anonymizer MCP server.
 from __future__ import annotations
 
 import logging
+import os
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 
 from anonymizer.model.project import ProjectModel
 from anonymizer.utils.logging import set_anonymizer_log_level
@@ -17,21 +21,49 @@ from .state import ProcessingState
 
 logger = logging.getLogger(__name__)
 
+_LOGGING_CONFIGURED = False
+
+
+def _count_files_fast(root: Path) -> int:
+    """Count files under root without building a Path per entry."""
+    # os.walk is scandir-based and already separates directories from files, so counting is
+    # just summing the filename lists. Unreadable or missing directories are skipped.
+    return sum(len(filenames) for _, _, filenames in os.walk(root, followlinks=False))
+
 
 class AnonymizerService:
     """
     Thin wrapper that feeds local DICOM files into the existing AnonymizerController.
     """
 
-    SUPPORTED_EXTENSIONS = {".dcm", ".dicom", ".ima", ""}  # include extensionless files
+    SUPPORTED_EXTENSIONS: frozenset[str] = frozenset({".dcm", ".dicom", ".ima", ""})  # include extensionless files
+    PREFETCH_CHUNK_SIZE = 1024 * 1024
+    READ_AHEAD_FILES = 2  # files read ahead of the one being anonymized, independent of the batch size
+    SCAN_CACHE_MAX_ENTRIES = 10_000  # larger input walks are not kept between calls
 
     def __init__(self, config: MCPConfig) -> None:
         self.config = config
-        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+        global _LOGGING_CONFIGURED
+        if not _LOGGING_CONFIGURED:
+            logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+            _LOGGING_CONFIGURED = True
 
         self._model: ProjectModel | None = None
         self._controller = None
-        self.state = ProcessingState(config.state_file)
+        # Storage locations are fixed for the service lifetime, resolve them once.
+        self._quarantine_path: Path | None = None
+        self._images_dir: Path | None = None
+        self.state = ProcessingState(config.state_file, root=config.paths.input_dir)
+        # Short-lived snapshot of the input walk so a status() poll followed by
+        # anonymize_now() does not traverse the input tree twice.
+        self._scan_cache: tuple[float, list[tuple[Path, os.stat_result]]] | None = None
+        self._scan_ttl = 1.0
+        # (size, mtime_ns, ctime_ns) of files the controller rejected during this service's lifetime.
+        # They stay in the input dir (quarantine copies them), so without this they would be retried
+        # on every call and could fill every max_concurrent_files batch. ctime is included so that
+        # transient failures (permissions, a file still being moved in) are retried once the file's
+        # metadata changes. Cleared by force_rescan.
+        self._failed: dict[Path, tuple[int, int, int]] = {}
 
     def _configure_model(self, model: ProjectModel) -> None:
         model.storage_dir = self.config.paths.output_dir
@@ -51,7 +83,8 @@ class AnonymizerService:
         # Ensure derived storage directories exist
         model.storage_dir.mkdir(parents=True, exist_ok=True)
         model.private_dir().mkdir(parents=True, exist_ok=True)
-        model.images_dir().mkdir(parents=True, exist_ok=True)
+        self._images_dir = model.images_dir()
+        self._images_dir.mkdir(parents=True, exist_ok=True)
 
     def _ensure_model(self) -> ProjectModel:
         if self._model is None:
@@ -68,6 +101,20 @@ class AnonymizerService:
             self._controller = AnonymizerController(model)
         return self._controller
 
+    @property
+    def quarantine_path(self) -> Path:
+        if self._quarantine_path is None:
+            # Same location as AnonymizerController.get_quarantine_path(), without building the controller.
+            model = self._ensure_model()
+            self._quarantine_path = model.private_dir() / model.QUARANTINE_DIR
+        return self._quarantine_path
+
+    @property
+    def images_dir(self) -> Path:
+        if self._images_dir is None:
+            self._images_dir = self._ensure_model().images_dir()
+        return self._images_dir
+
     def shutdown(self) -> None:
         if self._controller:
             self._controller.stop()
@@ -78,34 +125,77 @@ class AnonymizerService:
         start = time.perf_counter()
         if force_rescan:
             self.state.reset()
+            self._failed.clear()
+
+        # Reuse a scan that status() just did, otherwise stream the walk and keep only unprocessed files.
+        candidates: Iterable[tuple[Path, os.stat_result]] | None = None if force_rescan else self._cached_candidates()
+        if candidates is None:
+            candidates = self._collect_candidates()
 
-        candidates = list(self._collect_candidates())
-        if self.config.limits.max_concurrent_files:
-            candidates = candidates[: self.config.limits.max_concurrent_files]
+        files_seen = 0
 
-        enqueued = 0
+        def unprocessed() -> Iterator[tuple[Path, os.stat_result]]:
+            nonlocal files_seen
+            for path, st in candidates:
+                files_seen += 1
+                if not force_rescan:
+                    if self.state.is_processed_with_stat(path, st):
+                        continue
+                    if self._failed.get(path) == (st.st_size, st.st_mtime_ns, st.st_ctime_ns):
+                        continue  # unchanged since it last failed
+                yield path, st
+
+        # With a limit, stop walking as soon as enough unprocessed files have been found.
+        limit = self.config.limits.max_concurrent_files
+        to_process = list(islice(unprocessed(), limit)) if limit else list(unprocessed())
+
+        enqueued = len(to_process)
         completed = 0
         errors = 0
+        newly_processed: dict[Path, os.stat_result] = {}
 
-        for path in candidates:
-            if not force_rescan and self.state.is_processed(path):
-                continue
+        # AnonymizerController.anonymize_file() is not safe to call concurrently: PHI/study records
+        # are get-or-created in the shared AnonymizerModel database, which is why the controller
+        # itself runs a single dataset worker. So files are anonymized one at a time, while a small
+        # small pool reads the next few files ahead so their disk/network latency overlaps the current one.
+        read_ahead = min(self.READ_AHEAD_FILES, len(to_process))
+        executor = (
+            ThreadPoolExecutor(max_workers=read_ahead, thread_name_prefix="MCPPrefetch") if read_ahead > 1 else None
+        )
+        prefetches: deque[Future] = deque()
+        try:
+            if executor is not None:
+                prefetches.extend(executor.submit(self._prefetch, path) for path, _ in to_process[:read_ahead])
 
-            enqueued += 1
-            error_msg, _ = controller.anonymize_file(path)
-            if error_msg:
-                errors += 1
-                logger.error("Anonymization failed for %s: %s", path, error_msg)
-            else:
-                completed += 1
-                self.state.mark_processed(path)
+            for index, (path, st) in enumerate(to_process):
+                if executor is not None:
+                    prefetches.popleft().result()
+                    next_index = index + read_ahead
+                    if next_index < len(to_process):
+                        prefetches.append(executor.submit(self._prefetch, to_process[next_index][0]))
+
+                error_msg, _ = controller.anonymize_file(path)
+                if error_msg:
+                    errors += 1
+                    self._failed[path] = (st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+                    logger.error("Anonymization failed for %s: %s", path, error_msg)
+                else:
+                    completed += 1
+                    newly_processed[path] = st
+                    self._failed.pop(path, None)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            # Record what did get anonymized even if the controller or a prefetch raised mid-batch.
+            self.state.bulk_mark(newly_processed)
 
         self.state.save()
+        self._scan_cache = None
         duration_ms = (time.perf_counter() - start) * 1000
         quarantine_files = self._count_quarantine_files()
 
         return {
-            "files_seen": len(candidates),
+            "files_seen": files_seen,
             "enqueued": enqueued,
             "completed": completed,
             "errors": errors,
@@ -114,38 +204,95 @@ class AnonymizerService:
         }
 
     def status(self) -> dict[str, object]:
-        controller = self._ensure_controller()
-        datasets_q, pixel_q = controller.queued()
-        totals = controller.model.get_totals()
+        # Only report queues/totals once a tool has started the controller; status() alone
+        # should not pay for importing and initialising the anonymizer stack.
+        controller = self._controller
+        if controller is None:
+            datasets_q, pixel_q = 0, 0
+            totals: dict[str, int] = {}
+        else:
+            datasets_q, pixel_q = controller.queued()
+            totals = controller.model.get_totals()._asdict()
+        # The three walks are independent and I/O bound (scandir/stat release the GIL),
+        # so run them side by side. Paths are resolved here so workers never build the model.
+        images_dir, quarantine_path = self.images_dir, self.quarantine_path
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="MCPStatus") as executor:
+            input_files = executor.submit(self._count_input_files)
+            output_files = executor.submit(_count_files_fast, images_dir)
+            quarantine_files = executor.submit(_count_files_fast, quarantine_path)
         return {
             "queue": {"datasets": datasets_q, "pixel_phi": pixel_q},
-            "totals": totals._asdict(),
-            "input_files": self._count_input_files(),
-            "output_files": self._count_output_files(),
-            "quarantine_files": self._count_quarantine_files(),
+            "totals": totals,
+            "input_files": input_files.result(),
+            "output_files": output_files.result(),
+            "quarantine_files": quarantine_files.result(),
         }
 
-    def _collect_candidates(self) -> Iterable[Path]:
-        root = self.config.paths.input_dir
-        iterator = root.rglob("*") if self.config.processing.recursive_scan else root.glob("*")
-        for path in iterator:
-            if not path.is_file():
-                continue
-            if path.suffix.lower() in self.SUPPORTED_EXTENSIONS:
-                yield path
+    def _prefetch(self, path: Path) -> None:
+        # Pull the file into the OS page cache; dcmread in anonymize_file() then reads from memory.
+        try:
+            with open(path, "rb") as f:
+                while f.read(self.PREFETCH_CHUNK_SIZE):
+                    pass
+        except OSError:
+            pass  # anonymize_file() reports unreadable files
+
+    def _collect_candidates(self) -> Iterator[tuple[Path, os.stat_result]]:
+        # os.scandir exposes the d_type from readdir, so the file/dir checks below
+        # do not cost an extra stat() per entry the way Path.glob + Path.is_file did.
+        # The stat_result is yielded alongside the path so ProcessingState can
+        # compare mtimes without stat()ing the file a second time.
+        recursive = self.config.processing.recursive_scan
+        supported = self.SUPPORTED_EXTENSIONS
+        pending = [self.config.paths.input_dir]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            # Same rule as PurePath.suffix (dotfiles and trailing dots have no suffix),
+                            # applied to the name string before any Path object is built.
+                            name = entry.name
+                            dot = name.rfind(".")
+                            ext = name[dot:].lower() if 0 < dot < len(name) - 1 else ""
+                            if ext not in supported:
+                                continue
+                            try:
+                                st = entry.stat()
+                            except FileNotFoundError:
+                                continue  # removed between readdir and stat
+                            yield Path(entry.path), st
+                        elif recursive and entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+            except OSError as e:
+                logger.warning("Unable to scan %s: %s", directory, e)
+
+    def _cached_candidates(self) -> list[tuple[Path, os.stat_result]] | None:
+        if self._scan_cache is not None:
+            timestamp, paths = self._scan_cache
+            if time.monotonic() - timestamp < self._scan_ttl:
+                return paths
+            self._scan_cache = None  # expired: do not keep the snapshot alive
+        return None
 
     def _count_input_files(self) -> int:
-        return sum(1 for _ in self._collect_candidates())
+        paths = self._cached_candidates()
+        if paths is not None:
+            return len(paths)
 
-    def _count_output_files(self) -> int:
-        images_dir = self._ensure_model().images_dir()
-        if not images_dir.exists():
-            return 0
-        return sum(1 for file in images_dir.rglob("*") if file.is_file())
+        # Keep the walk for a follow-up anonymize_now() only while it stays small; beyond that
+        # anonymize_now() streams its own walk and holding the list would just pin memory.
+        count = 0
+        kept: list[tuple[Path, os.stat_result]] | None = []
+        for candidate in self._collect_candidates():
+            count += 1
+            if kept is not None:
+                kept.append(candidate)
+                if count > self.SCAN_CACHE_MAX_ENTRIES:
+                    kept = None
+        self._scan_cache = (time.monotonic(), kept) if kept is not None else None
+        return count
 
     def _count_quarantine_files(self) -> int:
-        controller = self._ensure_controller()
-        qpath = controller.get_quarantine_path()
-        if not qpath.exists():
-            return 0
-        return sum(1 for file in qpath.rglob("*") if file.is_file())
+        return _count_files_fast(self.quarantine_path)
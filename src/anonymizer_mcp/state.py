@@ -5,8 +5,34 @@ Lightweight persistence for which input files have already been anonymized.
 from __future__ import annotations
 
 import json
+import os
+import sys
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Mapping
+
+# (st_dev, st_ino, st_size, st_mtime_ns) recorded for each processed file
+FileSignature = tuple[int, int, int, int]
+
+
+def _dumps(payload: dict) -> bytes:
+    # Machine-only file: no indentation and no padding after separators, which also keeps
+    # the stdlib encoder on its C-accelerated path.
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _signature(st: os.stat_result) -> FileSignature:
+    return (int(st.st_dev), int(st.st_ino), int(st.st_size), int(st.st_mtime_ns))
+
+
+def _parse_signature(value: object) -> FileSignature | None:
+    # Older state files stored the bare mtime_ns; keep it for path matching but never use it
+    # for rename detection.
+    if isinstance(value, int):
+        return (0, 0, 0, value)
+    if isinstance(value, list) and len(value) == 4 and all(isinstance(v, int) for v in value):
+        return (value[0], value[1], value[2], value[3])
+    return None
 
 
 @dataclass(slots=True)
@@ -14,50 +40,135 @@ class ProcessingState:
     """
     Tracks files that have successfully gone through anonymization so we can
     skip re-processing unless the user explicitly forces a rescan.
+
+    Files are matched by path and mtime. A file whose device, inode, size and
+    mtime match a recorded entry is also treated as processed, but only when
+    that entry's path no longer exists, i.e. the file was renamed within the
+    same filesystem rather than a new file reusing a freed inode.
+
+    When `root` is given, paths under it are keyed relative to it; files
+    outside the root keep their absolute path as key.
     """
 
     path: Path
-    processed: dict[str, int] = field(default_factory=dict)
+    root: Path | None = None
+    processed: dict[str, FileSignature] = field(default_factory=dict)
+    # When > 0, save() is triggered automatically after this many marks.
+    flush_every_n: int = 0
     _dirty: bool = field(default=False, init=False)
+    _signatures: dict[FileSignature, str] = field(default_factory=dict, init=False)
+    _last_saved_hash: int | None = field(default=None, init=False)
+    _pending_marks: int = field(default=0, init=False)
+    _root_prefix: str = field(default="", init=False)
 
     def __post_init__(self) -> None:
+        self._root_prefix = os.path.join(str(self.root), "") if self.root is not None else ""
         if self.path.exists():
             try:
-                payload = json.loads(self.path.read_text(encoding="utf-8"))
+                raw_data = self.path.read_bytes()
+                self._last_saved_hash = hash(raw_data)
+                payload = json.loads(raw_data)
                 if isinstance(payload, dict):
-                    self.processed = {
-                        str(k): int(v) for k, v in payload.get("processed", {}).items() if isinstance(v, int)
-                    }
+                    stored_root = payload.get("root")
+                    rekey = stored_root != (str(self.root) if self.root is not None else None)
+                    self.processed = {}
+                    for k, v in payload.get("processed", {}).items():
+                        signature = _parse_signature(v)
+                        if signature is None:
+                            continue
+                        key = str(k)
+                        if rekey:
+                            # State written for another (or no) root: re-anchor keys to the current one.
+                            key = self._key(os.path.join(stored_root, key) if stored_root else key)
+                        self.processed[sys.intern(key)] = signature
+                    self._dirty = rekey and bool(self.processed)
             except Exception:
                 # Corrupt state should not crash the server; start fresh.
                 self.processed = {}
+                self._last_saved_hash = None
+        self._signatures = {sig: key for key, sig in self.processed.items() if sig[1]}
 
     def reset(self) -> None:
         self.processed.clear()
+        self._signatures.clear()
         self._dirty = True
 
-    def is_processed(self, file_path: Path) -> bool:
+    def _key(self, file_path: Path | str) -> str:
         key = str(file_path)
-        recorded = self.processed.get(key)
-        if recorded is None:
+        prefix = self._root_prefix
+        if prefix and key.startswith(prefix):
+            key = key[len(prefix) :]
+        return key
+
+    def _abspath(self, key: str) -> str:
+        # Absolute keys (files outside the root) are returned unchanged by os.path.join.
+        return os.path.join(self._root_prefix, key) if self._root_prefix else key
+
+    def is_processed(self, file_path: Path) -> bool:
+        if self._key(file_path) not in self.processed:
             return False
         try:
-            return recorded == int(file_path.stat().st_mtime_ns)
+            return self.is_processed_with_stat(file_path, file_path.stat())
         except FileNotFoundError:
             return True
 
     def mark_processed(self, file_path: Path) -> None:
         try:
-            mtime_ns = int(file_path.stat().st_mtime_ns)
+            signature = _signature(file_path.stat())
         except FileNotFoundError:
-            mtime_ns = 0
-        self.processed[str(file_path)] = mtime_ns
+            signature = (0, 0, 0, 0)
+        self._record(self._key(file_path), signature)
+
+    def is_processed_with_stat(self, file_path: Path, st: os.stat_result) -> bool:
+        key = self._key(file_path)
+        recorded = self.processed.get(key)
+        if recorded is not None and recorded[3] == st.st_mtime_ns:
+            return True
+        # st_ino is 0 where the platform does not report it (e.g. DirEntry.stat() on Windows)
+        if not st.st_ino:
+            return False
+        renamed_from = self._signatures.get(_signature(st))
+        if renamed_from is None or renamed_from == key:
+            return False
+        # Only a rename if the recorded file is gone; otherwise this is a hard link or a reused inode.
+        return not os.path.lexists(self._abspath(renamed_from))
+
+    def mark_processed_with_stat(self, file_path: Path, st: os.stat_result) -> None:
+        self._record(self._key(file_path), _signature(st))
+
+    def bulk_mark(self, stats: Mapping[Path, os.stat_result]) -> None:
+        if not stats:
+            return
+        signatures = {sys.intern(self._key(file_path)): _signature(st) for file_path, st in stats.items()}
+        self.processed.update(signatures)
+        self._signatures.update((sig, key) for key, sig in signatures.items() if sig[1])
+        self._marked(len(signatures))
+
+    def _record(self, key: str, signature: FileSignature) -> None:
+        key = sys.intern(key)
+        self.processed[key] = signature
+        if signature[1]:
+            self._signatures[signature] = key
+        self._marked(1)
+
+    def _marked(self, count: int) -> None:
         self._dirty = True
+        self._pending_marks += count
+        if self.flush_every_n and self._pending_marks >= self.flush_every_n:
+            self.save()
 
     def save(self) -> None:
         if not self._dirty:
             return
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        payload = {"processed": self.processed}
-        self.path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        root = str(self.root) if self.root is not None else None
+        data = _dumps({"root": root, "processed": self.processed})
+        data_hash = hash(data)
+        if data_hash != self._last_saved_hash:
+            # Write to a sibling file and swap it in so a crash never leaves a torn state file.
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, self.path)
+            self._last_saved_hash = data_hash
         self._dirty = False
+        self._pending_marks = 0
@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import pytest
+
+from anonymizer_mcp.config import ConfigError, MCPConfig
+
+
+def write_config(tmp_path: Path, body: str) -> Path:
+    (tmp_path / "downloads").mkdir(exist_ok=True)
+    config_path = tmp_path / "anonymizer.mcp.yaml"
+    config_path.write_text(body, encoding="utf-8")
+    return config_path
+
+
+def test_load_config(tmp_path: Path):
+    config_path = write_config(
+        tmp_path,
+        """
+paths:
+  input_dir: "./downloads"
+  output_dir: "./anonymized"
+  temp_dir: "./tmp"
+processing:
+  recursive_scan: true
+identity:
+  site_id: "123456"
+logging:
+  level: "debug"
+limits:
+  max_concurrent_files: 10
+""",
+    )
+    config = MCPConfig.from_file(config_path)
+
+    assert config.paths.input_dir == (tmp_path / "downloads").resolve()
+    assert config.paths.quarantine_dir == config.paths.output_dir / "private" / "quarantine"
+    assert config.processing.recursive_scan
+    assert config.identity.site_id == "123456"
+    assert config.identity.uid_root is None
+    assert config.logging.level == "DEBUG"
+    assert config.limits.max_concurrent_files == 10
+    assert config.state_file == config.paths.temp_dir / ".anonymizer_mcp_state.json"
+
+
+def test_missing_config_file(tmp_path: Path):
+    with pytest.raises(ConfigError, match="not found"):
+        MCPConfig.from_file(tmp_path / "missing.yaml")
+
+
+def test_top_level_must_be_mapping(tmp_path: Path):
+    config_path = write_config(tmp_path, "- input_dir\n- output_dir\n")
+    with pytest.raises(ConfigError, match="mapping"):
+        MCPConfig.from_file(config_path)
+
+
+def test_invalid_limits(tmp_path: Path):
+    config_path = write_config(
+        tmp_path,
+        """
+paths: {input_dir: "./downloads", output_dir: "./anonymized", temp_dir: "./tmp"}
+limits: {max_concurrent_files: 0}
+""",
+    )
+    with pytest.raises(ConfigError, match="max_concurrent_files"):
+        MCPConfig.from_file(config_path)
+
+
+def test_unknown_sections_are_ignored(tmp_path: Path):
+    config_path = write_config(
+        tmp_path,
+        """
+defaults: &defaults
+  input_dir: "./downloads"
+  output_dir: "./anonymized"
+  temp_dir: "./tmp"
+paths:
+  <<: *defaults
+notes:
+  - !!python/name:os.system ""
+logging:
+  level: "warning"
+""",
+    )
+    config = MCPConfig.from_file(config_path)
+
+    assert config.paths.output_dir == (tmp_path / "anonymized").resolve()
+    assert config.logging.level == "WARNING"
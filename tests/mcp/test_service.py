@@ -0,0 +1,259 @@
+from pathlib import Path
+from types import SimpleNamespace
+from typing import NamedTuple
+
+import pytest
+from pytest_mock import MockerFixture
+
+from anonymizer_mcp.config import MCPConfig
+from anonymizer_mcp.service import AnonymizerService
+
+
+class Totals(NamedTuple):
+    patients: int
+    studies: int
+    series: int
+    instances: int
+
+
+def make_service(tmp_path: Path, filenames: list[str], max_concurrent_files: int | None = None) -> AnonymizerService:
+    input_dir = tmp_path / "downloads"
+    input_dir.mkdir()
+    for name in filenames:
+        file = input_dir / name
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_bytes(b"DICM")
+
+    limit = max_concurrent_files if max_concurrent_files else "null"
+    config_path = tmp_path / "anonymizer.mcp.yaml"
+    config_path.write_text(
+        f"""
+paths: {{input_dir: "./downloads", output_dir: "./anonymized", temp_dir: "./tmp"}}
+processing: {{recursive_scan: true}}
+limits: {{max_concurrent_files: {limit}}}
+""",
+        encoding="utf-8",
+    )
+    return AnonymizerService(MCPConfig.from_file(config_path))
+
+
+def attach_controller(
+    mocker: MockerFixture, service: AnonymizerService, failing: frozenset[str] | set[str] = frozenset()
+):
+    controller = mocker.Mock()
+    controller.anonymize_file.side_effect = lambda path: (
+        ("Invalid DICOM", None) if path.name in failing else (None, None)
+    )
+    controller.queued.return_value = (3, 1)
+    controller.model.get_totals.return_value = Totals(patients=1, studies=2, series=3, instances=4)
+    mocker.patch.object(service, "_ensure_controller", return_value=controller)
+    service._controller = controller
+    return controller
+
+
+def candidate_names(service: AnonymizerService) -> list[str]:
+    root = service.config.paths.input_dir
+    return sorted(str(path.relative_to(root)) for path, _ in service._collect_candidates())
+
+
+def test_collect_candidates_suffix_rule(tmp_path: Path):
+    service = make_service(
+        tmp_path,
+        ["a.dcm", "b.DCM", "c.ima", "d.dicom", "noext", ".hidden", "trailing.", "e.txt", "f.dcm.png", "sub/g.dcm"],
+    )
+    # Same outcome as PurePath.suffix: dotfiles and trailing dots count as extensionless.
+    assert candidate_names(service) == sorted(
+        [".hidden", "a.dcm", "b.DCM", "c.ima", "d.dicom", "noext", "trailing.", str(Path("sub", "g.dcm"))]
+    )
+
+
+def test_anonymize_now_counts_and_skips_processed(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, ["a.dcm", "b.dcm", "c.dcm"])
+    controller = attach_controller(mocker, service)
+
+    result = service.anonymize_now()
+    assert (result["files_seen"], result["enqueued"], result["completed"], result["errors"]) == (3, 3, 3, 0)
+
+    result = service.anonymize_now()
+    assert (result["files_seen"], result["enqueued"], result["completed"]) == (3, 0, 0)
+    assert controller.anonymize_file.call_count == 3
+
+
+def test_force_rescan_reprocesses_everything(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, ["a.dcm", "b.dcm", "README"])
+    controller = attach_controller(mocker, service, failing={"README"})
+    service.anonymize_now()
+
+    result = service.anonymize_now(force_rescan=True)
+    assert (result["files_seen"], result["enqueued"], result["completed"], result["errors"]) == (3, 3, 2, 1)
+    assert controller.anonymize_file.call_count == 6
+
+
+def test_batches_advance_across_calls(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, [f"{i}.dcm" for i in range(5)], max_concurrent_files=2)
+    attach_controller(mocker, service)
+
+    enqueued = [service.anonymize_now()["enqueued"] for _ in range(4)]
+    assert enqueued == [2, 2, 1, 0]
+    assert len(service.state.processed) == 5
+
+
+def test_failing_files_do_not_stall_batches(tmp_path: Path, mocker: MockerFixture):
+    names = ["DICOMDIR", "LICENSE", "README", "a.dcm", "b.dcm"]
+    service = make_service(tmp_path, names, max_concurrent_files=2)
+    failing = {"DICOMDIR", "LICENSE", "README"}
+    controller = attach_controller(mocker, service, failing=failing)
+
+    results = [service.anonymize_now() for _ in range(4)]
+    assert sum(r["completed"] for r in results) == 2
+    assert sum(r["errors"] for r in results) == 3
+    assert results[-1]["enqueued"] == 0
+    assert results[-1]["files_seen"] == 5
+    assert sorted(service.state.processed) == ["a.dcm", "b.dcm"]
+    # Each failing file was attempted exactly once.
+    attempted = [call.args[0].name for call in controller.anonymize_file.call_args_list]
+    assert sorted(attempted) == sorted(names)
+
+
+def test_changed_failing_file_is_retried(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, ["partial.dcm"])
+    controller = attach_controller(mocker, service, failing={"partial.dcm"})
+    assert service.anonymize_now()["errors"] == 1
+    assert service.anonymize_now()["enqueued"] == 0
+
+    (service.config.paths.input_dir / "partial.dcm").write_bytes(b"DICM complete download")
+    controller.anonymize_file.side_effect = lambda path: (None, None)
+    assert service.anonymize_now()["completed"] == 1
+
+
+def test_failing_file_is_retried_after_metadata_change(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, ["locked.dcm"])
+    controller = attach_controller(mocker, service, failing={"locked.dcm"})
+    path, st = next(service._collect_candidates())
+    assert service.anonymize_now()["errors"] == 1
+
+    # e.g. a permission fix: same size and mtime, new ctime.
+    touched = SimpleNamespace(
+        st_dev=st.st_dev,
+        st_ino=st.st_ino,
+        st_size=st.st_size,
+        st_mtime_ns=st.st_mtime_ns,
+        st_ctime_ns=st.st_ctime_ns + 1,
+    )
+    mocker.patch.object(service, "_collect_candidates", return_value=[(path, touched)])
+    assert service.anonymize_now()["errors"] == 1
+    assert service.anonymize_now()["enqueued"] == 0
+    assert controller.anonymize_file.call_count == 2
+    # A repeated failure replaces the stale entry instead of adding another one.
+    assert service._failed == {path: (st.st_size, st.st_mtime_ns, st.st_ctime_ns + 1)}
+
+
+def test_files_done_before_an_exception_are_recorded(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, ["a.dcm", "b.dcm", "c.dcm"])
+    controller = attach_controller(mocker, service)
+    first, second, _ = (path for path, _ in service._collect_candidates())
+
+    def anonymize_file(path: Path):
+        if path == second:
+            raise RuntimeError("controller crashed")
+        return None, None
+
+    controller.anonymize_file.side_effect = anonymize_file
+    with pytest.raises(RuntimeError):
+        service.anonymize_now()
+
+    assert list(service.state.processed) == [first.name]
+
+
+def test_read_ahead_prefetches_each_file_in_walk_order(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, [f"{i}.dcm" for i in range(7)], max_concurrent_files=3)
+    controller = attach_controller(mocker, service, failing={"3.dcm"})
+    prefetch = mocker.spy(service, "_prefetch")
+    walk_order = [path for path, _ in service._collect_candidates()]
+    assert len(walk_order) > 3 > AnonymizerService.READ_AHEAD_FILES
+
+    service.anonymize_now()
+    service.anonymize_now()
+
+    anonymized = [call.args[0] for call in controller.anonymize_file.call_args_list]
+    assert anonymized == walk_order[:6]
+    assert sorted(call.args[0] for call in prefetch.call_args_list) == sorted(anonymized)
+
+
+@pytest.mark.parametrize("filenames", [[], ["only.dcm"]])
+def test_no_read_ahead_pool_for_small_batches(tmp_path: Path, mocker: MockerFixture, filenames: list[str]):
+    service = make_service(tmp_path, filenames)
+    controller = attach_controller(mocker, service)
+    executor = mocker.patch("anonymizer_mcp.service.ThreadPoolExecutor")
+
+    result = service.anonymize_now()
+
+    executor.assert_not_called()
+    assert result["enqueued"] == controller.anonymize_file.call_count == len(filenames)
+
+
+def test_status_without_controller(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, ["a.dcm", "b.dcm", "notes.txt"])
+    ensure_controller = mocker.patch.object(service, "_ensure_controller")
+
+    status = service.status()
+
+    ensure_controller.assert_not_called()
+    assert service._controller is None
+    assert status == {
+        "queue": {"datasets": 0, "pixel_phi": 0},
+        "totals": {},
+        "input_files": 2,
+        "output_files": 0,
+        "quarantine_files": 0,
+    }
+
+
+def test_status_with_controller(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, ["a.dcm"])
+    attach_controller(mocker, service)
+    service.anonymize_now()
+    (service.quarantine_path / "invalid_dicom").mkdir(parents=True)
+    (service.quarantine_path / "invalid_dicom" / "bad.dcm").write_bytes(b"")
+
+    status = service.status()
+
+    assert status == {
+        "queue": {"datasets": 3, "pixel_phi": 1},
+        "totals": {"patients": 1, "studies": 2, "series": 3, "instances": 4},
+        "input_files": 1,
+        "output_files": 0,
+        "quarantine_files": 1,
+    }
+
+
+def test_status_scan_is_reused_by_anonymize_now(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, ["a.dcm", "b.dcm"])
+    attach_controller(mocker, service)
+    walk = mocker.spy(service, "_collect_candidates")
+
+    assert service.status()["input_files"] == 2
+    assert service.anonymize_now()["completed"] == 2
+    assert walk.call_count == 1
+
+
+def test_expired_scan_snapshot_is_dropped(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, ["a.dcm", "b.dcm"])
+    attach_controller(mocker, service)
+    walk = mocker.spy(service, "_collect_candidates")
+    service.status()
+    assert service._scan_cache is not None
+
+    service._scan_ttl = 0
+    assert service._cached_candidates() is None
+    assert service._scan_cache is None
+    assert service.anonymize_now()["completed"] == 2
+    assert walk.call_count == 2
+
+
+def test_large_scan_is_not_cached(tmp_path: Path, mocker: MockerFixture):
+    service = make_service(tmp_path, ["a.dcm", "b.dcm", "c.dcm"])
+    mocker.patch.object(AnonymizerService, "SCAN_CACHE_MAX_ENTRIES", 2)
+
+    assert service.status()["input_files"] == 3
+    assert service._scan_cache is None
@@ -0,0 +1,166 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from anonymizer_mcp.state import ProcessingState
+
+
+@pytest.fixture
+def dicom_file(tmp_path: Path) -> Path:
+    path = tmp_path / "input" / "image1.dcm"
+    path.parent.mkdir()
+    path.write_bytes(b"DICM")
+    return path
+
+
+def test_mark_and_reload_state(tmp_path: Path, dicom_file: Path):
+    state_path = tmp_path / "state.json"
+    state = ProcessingState(state_path)
+    assert not state.is_processed(dicom_file)
+
+    state.mark_processed_with_stat(dicom_file, dicom_file.stat())
+    state.save()
+
+    reloaded = ProcessingState(state_path)
+    assert reloaded.is_processed(dicom_file)
+    assert reloaded.is_processed_with_stat(dicom_file, dicom_file.stat())
+
+
+def test_modified_file_is_not_processed(tmp_path: Path, dicom_file: Path):
+    state = ProcessingState(tmp_path / "state.json")
+    state.mark_processed(dicom_file)
+
+    st = dicom_file.stat()
+    os.utime(dicom_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert not state.is_processed(dicom_file)
+
+
+def test_renamed_file_is_still_processed(tmp_path: Path, dicom_file: Path):
+    state = ProcessingState(tmp_path / "state.json")
+    state.mark_processed(dicom_file)
+
+    renamed = dicom_file.with_name("renamed.dcm")
+    dicom_file.rename(renamed)
+    st = renamed.stat()
+    if not st.st_ino:
+        pytest.skip("platform does not report inode numbers")
+    assert state.is_processed_with_stat(renamed, st)
+
+
+def test_hard_link_is_not_treated_as_rename(tmp_path: Path, dicom_file: Path):
+    state = ProcessingState(tmp_path / "state.json")
+    state.mark_processed(dicom_file)
+
+    linked = dicom_file.with_name("linked.dcm")
+    try:
+        os.link(dicom_file, linked)
+    except OSError:
+        pytest.skip("filesystem does not support hard links")
+    # Same device, inode, size and mtime, but the recorded file still exists.
+    assert not state.is_processed_with_stat(linked, linked.stat())
+
+
+def test_legacy_mtime_only_state(tmp_path: Path, dicom_file: Path):
+    state_path = tmp_path / "state.json"
+    payload = {"processed": {str(dicom_file): dicom_file.stat().st_mtime_ns, "bad": "x"}}
+    state_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+    state = ProcessingState(state_path)
+    assert list(state.processed) == [str(dicom_file)]
+    assert state.is_processed(dicom_file)
+
+
+def test_corrupt_state_starts_fresh(tmp_path: Path):
+    state_path = tmp_path / "state.json"
+    state_path.write_text("{not json", encoding="utf-8")
+    assert ProcessingState(state_path).processed == {}
+
+
+def test_state_file_is_compact_json(tmp_path: Path, dicom_file: Path):
+    state_path = tmp_path / "state.json"
+    state = ProcessingState(state_path)
+    state.mark_processed(dicom_file)
+    state.save()
+
+    raw_data = state_path.read_text(encoding="utf-8")
+    assert "\n" not in raw_data and ", " not in raw_data
+    assert str(dicom_file) in json.loads(raw_data)["processed"]
+
+
+def test_save_skips_unchanged_content(tmp_path: Path, dicom_file: Path):
+    state_path = tmp_path / "state.json"
+    state = ProcessingState(state_path)
+    state.mark_processed(dicom_file)
+    state.save()
+    first_mtime = state_path.stat().st_mtime_ns
+
+    reloaded = ProcessingState(state_path)
+    reloaded.mark_processed(dicom_file)  # same signature, content unchanged
+    os.utime(state_path, ns=(first_mtime - 1_000_000_000, first_mtime - 1_000_000_000))
+    reloaded.save()
+    assert state_path.stat().st_mtime_ns == first_mtime - 1_000_000_000
+    assert not state_path.with_suffix(".tmp").exists()
+
+
+def test_flush_every_n(tmp_path: Path):
+    state_path = tmp_path / "state.json"
+    state = ProcessingState(state_path, flush_every_n=2)
+    files = []
+    for name in ("a.dcm", "b.dcm", "c.dcm"):
+        file = tmp_path / name
+        file.write_bytes(b"DICM")
+        files.append(file)
+
+    state.mark_processed(files[0])
+    assert not state_path.exists()
+    state.mark_processed(files[1])
+    assert len(ProcessingState(state_path).processed) == 2
+    state.mark_processed(files[2])
+    assert len(ProcessingState(state_path).processed) == 2
+
+
+def test_bulk_mark(tmp_path: Path, dicom_file: Path):
+    state_path = tmp_path / "state.json"
+    state = ProcessingState(state_path)
+    state.bulk_mark({})
+    state.save()
+    assert not state_path.exists()
+
+    state.bulk_mark({dicom_file: dicom_file.stat()})
+    state.save()
+    assert ProcessingState(state_path).is_processed(dicom_file)
+
+
+def test_keys_are_relative_to_root(tmp_path: Path, dicom_file: Path):
+    state_path = tmp_path / "state.json"
+    root = dicom_file.parent
+    outside = tmp_path / "outside.dcm"
+    outside.write_bytes(b"DICM")
+
+    state = ProcessingState(state_path, root=root)
+    state.mark_processed(dicom_file)
+    state.mark_processed(outside)
+    state.save()
+
+    payload = json.loads(state_path.read_text(encoding="utf-8"))
+    assert payload["root"] == str(root)
+    assert set(payload["processed"]) == {"image1.dcm", str(outside)}
+    assert ProcessingState(state_path, root=root).is_processed(dicom_file)
+
+
+def test_state_migrates_to_new_root(tmp_path: Path, dicom_file: Path):
+    state_path = tmp_path / "state.json"
+    legacy = ProcessingState(state_path)  # no root: absolute keys
+    legacy.mark_processed(dicom_file)
+    legacy.save()
+
+    state = ProcessingState(state_path, root=dicom_file.parent)
+    assert list(state.processed) == ["image1.dcm"]
+    assert state.is_processed(dicom_file)
+    state.save()
+
+    moved = ProcessingState(state_path, root=tmp_path)
+    assert list(moved.processed) == [os.path.join("input", "image1.dcm")]
+    assert moved.is_processed(dicom_file)